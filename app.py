@@ -2,10 +2,17 @@ import streamlit as st
 import pandas as pd
 import sqlalchemy as sa
 from sqlalchemy import text
-import altair as alt
-from io import StringIO
+import pyarrow as pa
+from pyarrow import csv as pacsv
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import pymysql  # driver for mysql+pymysql
 
+try:
+    import connectorx as cx  # optional: Rust-side SQL -> DataFrame reader
+except ImportError:
+    cx = None
+
 # --- Compatibility wrappers for Streamlit width API ---
 # We use stdlib inspect for signature checks
 # ---------- Compatibility wrappers for Streamlit width/height/use_container_width API ----------
@@ -19,98 +26,37 @@ def _sig_supports(func, name):
     except Exception:
         return False
 
-# detect supported params for altair_chart
-_ALT_SUPPORTS_WIDTH = _sig_supports(st.altair_chart, "width")
-_ALT_SUPPORTS_HEIGHT = _sig_supports(st.altair_chart, "height")
-_ALT_SUPPORTS_USE_CONTAINER = _sig_supports(st.altair_chart, "use_container_width")
-
-# detect supported params for dataframe
-_DF_SUPPORTS_WIDTH = _sig_supports(st.dataframe, "width")
-_DF_SUPPORTS_HEIGHT = _sig_supports(st.dataframe, "height")
-_DF_SUPPORTS_USE_CONTAINER = _sig_supports(st.dataframe, "use_container_width")
-
-def display_chart(chart, *, height=None):
-    """
-    Robust wrapper to display an Altair chart across Streamlit versions.
-    - Tries to call st.altair_chart with width/height when possible.
-    - If 'height' param not supported, sets chart = chart.properties(height=height).
-    - If 'width' not supported, falls back to use_container_width (if available).
-    """
-    # ensure chart is an Altair chart object
+def _width_accepts_stretch(func):
+    """Return True if `func`'s `width` takes "stretch" (older releases only take pixels)."""
     try:
-        is_altair = hasattr(chart, "to_dict")
+        param = _inspect.signature(func).parameters.get("width")
     except Exception:
-        is_altair = False
-
-    # If height param not supported but we have an Altair chart, set it on the chart
-    chart_to_show = chart
-    if height is not None and not _ALT_SUPPORTS_HEIGHT and is_altair:
-        try:
-            chart_to_show = chart.properties(height=height)
-        except Exception:
-            # if setting properties fails, ignore and display without
-            chart_to_show = chart
-
-    # Preferred call: width supported
-    if _ALT_SUPPORTS_WIDTH:
-        kwargs = {}
-        if height is not None and _ALT_SUPPORTS_HEIGHT:
-            kwargs["height"] = height
-        # width param supported -> use "stretch" for modern API
-        try:
-            st.altair_chart(chart_to_show, width="stretch", **kwargs)
-            return
-        except TypeError:
-            # fall through to other methods
-            pass
-
-    # Fallback: use_container_width supported?
-    if _ALT_SUPPORTS_USE_CONTAINER:
-        if height is not None and _ALT_SUPPORTS_HEIGHT:
-            # if height supported (rare) include it
-            st.altair_chart(chart_to_show, use_container_width=True, height=height)
-        else:
-            st.altair_chart(chart_to_show, use_container_width=True)
-        return
-
-    # Last fallback: call without special args (chart may already have properties(height=...))
-    try:
-        st.altair_chart(chart_to_show)
-    except Exception:
-        # as a last-ditch, convert to st.write
-        st.write(chart_to_show)
+        return False
+    # Annotations are strings here; Streamlit's `Width` alias is the one allowing "stretch"
+    annotation = str(param.annotation) if param is not None else ""
+    return "Width" in annotation or "stretch" in annotation
 
-def display_dataframe(df, *, height=None):
-    """
-    Robust wrapper for st.dataframe across Streamlit versions.
-    - Uses width='stretch' if supported.
-    - Else falls back to use_container_width if supported.
-    - Height passed only if supported by st.dataframe.
-    """
-    # if width supported, try width + optionally height
-    if _DF_SUPPORTS_WIDTH:
-        kwargs = {}
-        if height is not None and _DF_SUPPORTS_HEIGHT:
-            kwargs["height"] = height
-        try:
-            st.dataframe(df, width="stretch", **kwargs)
-            return
-        except TypeError:
-            pass
-
-    # else if use_container_width supported
-    if _DF_SUPPORTS_USE_CONTAINER:
-        if height is not None and _DF_SUPPORTS_HEIGHT:
-            st.dataframe(df, use_container_width=True, height=height)
-        else:
-            st.dataframe(df, use_container_width=True)
-        return
-
-    # last fallback
-    try:
-        st.dataframe(df)
-    except Exception:
-        st.write(df)
+# Pick one concrete display call per widget at import time, so rendering a tab
+# does no signature checks or try/except fallbacks.
+# Preferred: width="stretch" (modern API) > use_container_width > plain call.
+def _pick_display(func):
+    """Return `func` pre-bound to the best width argument this Streamlit supports."""
+    if _width_accepts_stretch(func):
+        return partial(func, width="stretch")
+    if _sig_supports(func, "use_container_width"):
+        return partial(func, use_container_width=True)
+    return func
+
+# display_vega_chart(df, spec) -- height is carried by the spec itself
+display_vega_chart = _pick_display(st.vega_lite_chart)
+# display_dataframe(df, height=None)
+display_dataframe = _pick_display(st.dataframe)
+
+# st.fragment (>=1.37) / st.experimental_fragment; plain call on older versions
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+# Arrow-backed result frames (pandas >= 2.0); numpy dtypes on older pandas
+READ_SQL_KW = {"dtype_backend": "pyarrow"} if _sig_supports(pd.read_sql_query, "dtype_backend") else {}
 
 
 # ---------- CONFIG ----------
@@ -121,397 +67,400 @@ DB_PORT = 3306
 DB_NAME = "football_db"
 
 CONN_STR = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
-engine = sa.create_engine(CONN_STR, pool_pre_ping=True)
+
+@st.cache_resource(show_spinner=False)
+def get_engine():
+    # Streamlit re-executes this script on every interaction: build the pool once
+    # per process so reruns reuse open connections instead of reconnecting.
+    # pool_recycle replaces the per-checkout pre-ping round trip.
+    return sa.create_engine(
+        CONN_STR,
+        poolclass=sa.pool.QueuePool,
+        pool_size=5,
+        max_overflow=10,
+        pool_recycle=1800,
+    )
+
+engine = get_engine()
+# connectorx takes a plain DSN (no driver suffix / query args)
+CX_CONN_STR = f"mysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 st.set_page_config(page_title="Football Analytics Dashboard", layout="wide")
 st.title("Football Analytics Dashboard — Premier League 2024-2025")
 
 # ---------- Utility helpers ----------
-@st.cache_data(ttl=300)
-def load_teams():
-    q = "SELECT idequipe, nomequipe FROM equipe ORDER BY nomequipe"
-    return pd.read_sql_query(q, engine)
-
-@st.cache_data(ttl=300)
-def load_players_count():
-    q = "SELECT COUNT(*) AS cnt FROM joueur"
-    df = pd.read_sql_query(q, engine)
-    return int(df['cnt'].iloc[0]) if not df.empty else 0
-
-@st.cache_data(ttl=300)
-def load_nationalities():
-    q = "SELECT DISTINCT nationalite FROM joueur WHERE nationalite IS NOT NULL"
-    return pd.read_sql_query(q, engine)
+def read_sql(q, params=None):
+    """
+    Run a query and return a DataFrame.
+    - Uses connectorx when installed (rows are written straight into the frame).
+    - connectorx has no bind-param support, so params are inlined as escaped literals.
+    - Falls back to pandas + SQLAlchemy otherwise.
+    - Frames are Arrow-backed either way (no object arrays for strings).
+    """
+    stmt = text(q) if isinstance(q, str) else q
+    params = params or {}
+    if cx is None:
+        with engine.connect() as conn:
+            return pd.read_sql_query(stmt, conn, params=params, **READ_SQL_KW)
+    names = stmt.compile().params
+    stmt = stmt.bindparams(**{k: v for k, v in params.items() if k in names})
+    sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    return cx.read_sql(CX_CONN_STR, sql, return_type="arrow").to_pandas(types_mapper=pd.ArrowDtype)
+
+@st.cache_resource(show_spinner=False)
+def reference_data():
+    """
+    Static reference data for the sidebar, fetched over one connection checkout.
+    - Kept process-wide (no per-hit pickling); cleared via the sidebar refresh button.
+    - Returns (team names, nationalities, player count) as plain tuples.
+    """
+    with engine.connect() as conn:
+        teams = conn.execute(text("SELECT nomequipe FROM equipe ORDER BY nomequipe")).scalars().all()
+        nats = conn.execute(text("SELECT DISTINCT nationalite FROM joueur WHERE nationalite IS NOT NULL")).scalars().all()
+        cnt = conn.execute(text("SELECT COUNT(*) FROM joueur")).scalar()
+    return tuple(teams), tuple(str(n) for n in nats), int(cnt or 0)
 
+@st.cache_data(show_spinner=False)
 def df_to_csv_bytes(df: pd.DataFrame):
-    buf = StringIO()
-    df.to_csv(buf, index=False)
-    return buf.getvalue().encode('utf-8')
+    # pyarrow's C++ CSV writer; cached so reruns reuse the encoded bytes
+    buf = pa.BufferOutputStream()
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buf)
+    return buf.getvalue().to_pybytes()
 
 # ---------- Sidebar filters ----------
 st.sidebar.header("Filters")
-teams_df = load_teams()
-team_options = teams_df['nomequipe'].tolist() if not teams_df.empty else []
+if st.sidebar.button("Refresh reference data"):
+    reference_data.clear()
+team_names, nationalities, players_count = reference_data()
+team_options = list(team_names)
 selected_teams = st.sidebar.multiselect("Select team(s)", options=team_options, default=None)
 
-nationalities_df = load_nationalities()
-nationality_options = list(nationalities_df['nationalite'].dropna().astype(str).unique()) if not nationalities_df.empty else []
+nationality_options = list(nationalities)
 selected_nationalities = st.sidebar.multiselect("Nationality filter", options=nationality_options, default=None)
 
 top_n = st.sidebar.slider("Top N (for top players)", min_value=3, max_value=50, value=10, step=1)
 
-def team_filter_clause(alias='e'):
-    if not selected_teams:
-        return "", {}
-    placeholders = ", ".join([f":t{i}" for i in range(len(selected_teams))])
-    clause = f" AND {alias}.nomequipe IN ({placeholders}) "
-    params = {f"t{i}": selected_teams[i] for i in range(len(selected_teams))}
-    return clause, params
-
-def nationality_filter_clause(alias='j'):
-    if not selected_nationalities:
-        return "", {}
-    placeholders = ", ".join([f":n{i}" for i in range(len(selected_nationalities))])
-    clause = f" AND {alias}.nationalite IN ({placeholders}) "
-    params = {f"n{i}": selected_nationalities[i] for i in range(len(selected_nationalities))}
-    return clause, params
+# Team / nationality filters are two expanding IN binds plus an "all" flag, so each
+# query compiles to one statement whatever the selection, and cached helpers are
+# keyed by plain tuples.
+FILTER_BINDS = (
+    sa.bindparam("all_teams", type_=sa.Boolean),
+    sa.bindparam("teams", expanding=True, type_=sa.String),
+    sa.bindparam("all_nats", type_=sa.Boolean),
+    sa.bindparam("nats", expanding=True, type_=sa.String),
+)
+
+def filter_params(teams=(), nationalities=()):
+    """Bind values for FILTER_BINDS; an empty selection means no filter."""
+    return {
+        "all_teams": not teams, "teams": list(teams) or [""],
+        "all_nats": not nationalities, "nats": list(nationalities) or [""],
+    }
 
 # ---------- Analysis functions ----------
-@st.cache_data(ttl=300)
-def top_scorers(limit=10, team_where="", params=None):
-    params = params or {}
-    q = text(f"""
-        SELECT j.nomjoueur AS player, e.nomequipe AS team, SUM(COALESCE(s.buts,0)) AS goals
-        FROM statistiquejoueur s
-        JOIN joueur j ON s.idjoueur = j.idjoueur
-        JOIN equipe e ON j.id_equipe = e.idequipe
-        WHERE 1=1 {team_where}
-        GROUP BY j.nomjoueur, e.nomequipe
-        ORDER BY goals DESC
-        LIMIT :limit
-    """)
-    params2 = dict(params); params2['limit'] = limit
-    return pd.read_sql_query(q, engine, params=params2)
-
-@st.cache_data(ttl=300)
-def most_decisive(limit=10, team_where="", params=None):
-    params = params or {}
-    q = text(f"""
+# Player-level tabs (top scorers, decisive, discipline, top scorer per team) share
+# one aggregate over statistiquejoueur/joueur/equipe, filtered in the DB.
+# Team-level tabs share one unfiltered aggregate over resultatmatch/equipe (one row
+# per team, cached once) and apply the team selection in pandas.
+# The per-tab views are derived in pandas.
+@st.cache_data(ttl=300, show_spinner=False)
+def player_aggregates(teams=(), nationalities=()):
+    q = text("""
         SELECT j.nomjoueur AS player, e.nomequipe AS team,
                SUM(COALESCE(s.buts,0)) AS goals,
                SUM(COALESCE(s.passesdecisives,0)) AS assists,
-               SUM(COALESCE(s.buts,0))+SUM(COALESCE(s.passesdecisives,0)) AS influence
-        FROM statistiquejoueur s
-        JOIN joueur j ON s.idjoueur = j.idjoueur
-        JOIN equipe e ON j.id_equipe = e.idequipe
-        WHERE 1=1 {team_where}
-        GROUP BY j.nomjoueur, e.nomequipe
-        ORDER BY influence DESC
-        LIMIT :limit
-    """)
-    p = dict(params); p['limit']=limit
-    return pd.read_sql_query(q, engine, params=p)
-
-@st.cache_data(ttl=300)
-def most_disciplined(limit=10, team_where="", params=None):
-    params = params or {}
-    q = text(f"""
-        SELECT j.nomjoueur AS player, e.nomequipe AS team,
                SUM(COALESCE(s.cartonsjaunes,0)) AS yellows,
-               SUM(COALESCE(s.cartonsrouges,0)) AS reds,
-               SUM(COALESCE(s.cartonsjaunes,0)) + 3*SUM(COALESCE(s.cartonsrouges,0)) AS discipline_score
+               SUM(COALESCE(s.cartonsrouges,0)) AS reds
         FROM statistiquejoueur s
         JOIN joueur j ON s.idjoueur = j.idjoueur
         JOIN equipe e ON j.id_equipe = e.idequipe
-        WHERE 1=1 {team_where}
+        WHERE (:all_teams OR e.nomequipe IN :teams)
+          AND (:all_nats OR j.nationalite IN :nats)
         GROUP BY j.nomjoueur, e.nomequipe
-        ORDER BY discipline_score DESC
-        LIMIT :limit
-    """)
-    p = dict(params); p['limit']=limit
-    return pd.read_sql_query(q, engine, params=p)
-
-@st.cache_data(ttl=300)
-def nationality_distribution(team_where="", params=None):
-    params = params or {}
-    q = text(f"""
+    """).bindparams(*FILTER_BINDS)
+    df = read_sql(q, filter_params(teams, nationalities))
+    # MySQL returns SUM() as DECIMAL
+    return df.astype({"goals": "int64", "assists": "int64", "yellows": "int64", "reds": "int64"})
+
+def top_scorers(limit=10, teams=(), nationalities=()):
+    agg = player_aggregates(teams, nationalities)
+    return agg.nlargest(limit, "goals")[["player", "team", "goals"]].reset_index(drop=True)
+
+def most_decisive(limit=10, teams=(), nationalities=()):
+    agg = player_aggregates(teams, nationalities)
+    agg = agg.assign(influence=agg["goals"] + agg["assists"])
+    return agg.nlargest(limit, "influence")[["player", "team", "goals", "assists", "influence"]].reset_index(drop=True)
+
+def most_disciplined(limit=10, teams=(), nationalities=()):
+    agg = player_aggregates(teams, nationalities)
+    agg = agg.assign(discipline_score=agg["yellows"] + 3 * agg["reds"])
+    return agg.nlargest(limit, "discipline_score")[["player", "team", "yellows", "reds", "discipline_score"]].reset_index(drop=True)
+
+def top_scorer_per_team(teams=(), nationalities=()):
+    agg = player_aggregates(teams, nationalities)
+    if agg.empty:
+        return agg[["team", "player", "goals"]]
+    best = agg.loc[agg.groupby("team")["goals"].idxmax(), ["team", "player", "goals"]]
+    return best.sort_values("goals", ascending=False).reset_index(drop=True)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def nationality_distribution(teams=(), nationalities=()):
+    q = text("""
         SELECT e.nomequipe AS team, j.nationalite AS nationality, COUNT(*) AS count
         FROM joueur j
         JOIN equipe e ON j.id_equipe = e.idequipe
-        WHERE j.nationalite IS NOT NULL {team_where}
+        WHERE j.nationalite IS NOT NULL
+          AND (:all_teams OR e.nomequipe IN :teams)
+          AND (:all_nats OR j.nationalite IN :nats)
         GROUP BY e.nomequipe, j.nationalite
         ORDER BY e.nomequipe, count DESC
-    """)
-    return pd.read_sql_query(q, engine, params=params)
-
-@st.cache_data(ttl=300)
-def total_goals_per_team(team_where="", params=None):
-    params = params or {}
-    q = text(f"""
-        SELECT e.nomequipe AS team,
-               SUM(COALESCE(r.butsmarques,0)) AS total_goals_for,
-               SUM(COALESCE(r.butsconcedes,0)) AS total_goals_against
-        FROM resultatmatch r
-        JOIN equipe e ON r.idequipe = e.idequipe
-        WHERE 1=1 {team_where}
-        GROUP BY e.nomequipe
-        ORDER BY total_goals_for DESC
-    """)
-    return pd.read_sql_query(q, engine, params=params)
-
-@st.cache_data(ttl=300)
-def avg_goals_per_match(team_where="", params=None):
-    params = params or {}
-    q = text(f"""
-        SELECT t.team, 
-               (t.total_goals_for / NULLIF(t.matches_played,0)) AS avg_scored_per_match,
-               (t.total_goals_against / NULLIF(t.matches_played,0)) AS avg_conceded_per_match,
-               t.total_goals_for, t.total_goals_against, t.matches_played
-        FROM (
-            SELECT e.nomequipe AS team,
-                   SUM(COALESCE(r.butsmarques,0)) AS total_goals_for,
-                   SUM(COALESCE(r.butsconcedes,0)) AS total_goals_against,
-                   COUNT(DISTINCT r.idmatch) AS matches_played
-            FROM resultatmatch r
-            JOIN equipe e ON r.idequipe = e.idequipe
-            WHERE 1=1 {team_where}
-            GROUP BY e.nomequipe
-        ) t
-        ORDER BY avg_scored_per_match DESC
-    """)
-    return pd.read_sql_query(q, engine, params=params)
-
-@st.cache_data(ttl=300)
-def league_table(team_where="", params=None):
-    params = params or {}
-    q = text(f"""
+    """).bindparams(*FILTER_BINDS)
+    return read_sql(q, filter_params(teams, nationalities))
+
+@st.cache_data(ttl=300, show_spinner=False)
+def team_aggregates():
+    if HAS_LEAGUE_MV:
+        # Materialized by load_to_mysql.py after each load
+        return _int_counts(read_sql(text("SELECT * FROM league_table_mv")))
+    q = text("""
         SELECT e.nomequipe AS team,
-               SUM(CASE WHEN r.resultat='Victoire' THEN 3 WHEN r.resultat='Nul' THEN 1 ELSE 0 END) AS points,
                SUM(COALESCE(r.butsmarques,0)) AS goals_for,
                SUM(COALESCE(r.butsconcedes,0)) AS goals_against,
-               SUM(COALESCE(r.butsmarques,0)) - SUM(COALESCE(r.butsconcedes,0)) AS goal_diff,
                COUNT(DISTINCT r.idmatch) AS matches_played,
                SUM(CASE WHEN r.resultat='Victoire' THEN 1 ELSE 0 END) AS wins,
                SUM(CASE WHEN r.resultat='Nul' THEN 1 ELSE 0 END) AS draws,
                SUM(CASE WHEN r.resultat='Défaite' THEN 1 ELSE 0 END) AS losses
         FROM resultatmatch r
         JOIN equipe e ON r.idequipe = e.idequipe
-        WHERE 1=1 {team_where}
         GROUP BY e.nomequipe
-        ORDER BY points DESC, goal_diff DESC, goals_for DESC
     """)
-    return pd.read_sql_query(q, engine, params=params)
+    return _int_counts(read_sql(q))
+
+def _int_counts(df):
+    # MySQL returns SUM() as DECIMAL
+    return df.astype({c: "int64" for c in ["goals_for", "goals_against", "matches_played", "wins", "draws", "losses"]})
+
+def _team_rows(teams=None):
+    ta = team_aggregates()
+    return ta[ta["team"].isin(teams)] if teams else ta
+
+def total_goals_per_team(teams=None):
+    ta = _team_rows(teams)
+    df = ta.rename(columns={"goals_for": "total_goals_for", "goals_against": "total_goals_against"})
+    df = df[["team", "total_goals_for", "total_goals_against"]]
+    return df.sort_values("total_goals_for", ascending=False).reset_index(drop=True)
+
+def avg_goals_per_match(teams=None):
+    ta = _team_rows(teams)
+    played = ta["matches_played"].where(ta["matches_played"] > 0)
+    df = pd.DataFrame({
+        "team": ta["team"],
+        "avg_scored_per_match": ta["goals_for"] / played,
+        "avg_conceded_per_match": ta["goals_against"] / played,
+        "total_goals_for": ta["goals_for"],
+        "total_goals_against": ta["goals_against"],
+        "matches_played": ta["matches_played"],
+    })
+    return df.sort_values("avg_scored_per_match", ascending=False).reset_index(drop=True)
+
+def league_table(teams=None):
+    ta = _team_rows(teams)
+    df = ta.assign(
+        points=3 * ta["wins"] + ta["draws"],
+        goal_diff=ta["goals_for"] - ta["goals_against"],
+    )
+    df = df[["team", "points", "goals_for", "goals_against", "goal_diff", "matches_played", "wins", "draws", "losses"]]
+    return df.sort_values(["points", "goal_diff", "goals_for"], ascending=False).reset_index(drop=True)
+
+def best_defense(teams=None):
+    ta = _team_rows(teams)
+    df = ta.rename(columns={"goals_against": "goals_conceded"})[["team", "goals_conceded"]]
+    return df.sort_values("goals_conceded").reset_index(drop=True)
+
+def matches_played_per_team(teams=None):
+    ta = _team_rows(teams)
+    df = ta[["team", "matches_played"]]
+    return df.sort_values("matches_played", ascending=False).reset_index(drop=True)
+
+# ---------- DB inspection ----------
+@st.cache_resource(show_spinner=False)
+def _db_shape():
+    """
+    Probe the schema once per process (not on every rerun).
+    Returns (table count, match table name, away-team column name, has league_table_mv).
+    """
+    # Use sa.inspect to avoid colliding with stdlib inspect
+    inspector = sa.inspect(engine)
+    tables = inspector.get_table_names()
+    if 'match_' in tables:
+        match_table = 'match_'
+    elif 'match' in tables:
+        match_table = 'match'
+    else:
+        match_table = None
 
-@st.cache_data(ttl=300)
-def best_defense(team_where="", params=None):
-    params = params or {}
-    q = text(f"""
-        SELECT e.nomequipe AS team, SUM(COALESCE(r.butsconcedes,0)) AS goals_conceded
-        FROM resultatmatch r
-        JOIN equipe e ON r.idequipe = e.idequipe
-        WHERE 1=1 {team_where}
-        GROUP BY e.nomequipe
-        ORDER BY goals_conceded ASC
-    """)
-    return pd.read_sql_query(q, engine, params=params)
-
-# ---------- DB inspection & adaptive top-scorer ----------
-# Use sa.inspect to avoid colliding with stdlib inspect
-inspector = sa.inspect(engine)
-all_tables = inspector.get_table_names()
-if 'match_' in all_tables:
-    TABLE_MATCH_NAME = 'match_'
-elif 'match' in all_tables:
-    TABLE_MATCH_NAME = 'match'
-else:
-    TABLE_MATCH_NAME = None
-
-COL_IDTEAM_AWAY = 'idteam_away'
-if TABLE_MATCH_NAME:
-    cols = [c['name'] for c in inspector.get_columns(TABLE_MATCH_NAME)]
-    if 'idteam__away' in cols:
-        COL_IDTEAM_AWAY = 'idteam__away'
-    elif 'idteam_away' in cols:
-        COL_IDTEAM_AWAY = 'idteam_away'
-
-st.sidebar.markdown(f"**Detected DB:** tables={len(all_tables)}, match_table={TABLE_MATCH_NAME}, away_col={COL_IDTEAM_AWAY}")
-
-@st.cache_data(ttl=300)
-def top_scorer_per_team(team_where="", params=None):
-    params = params or {}
-    try:
-        q_rownum = text(f"""
-            SELECT t.team, t.player, t.goals FROM (
-                SELECT e.nomequipe AS team, j.nomjoueur AS player, SUM(COALESCE(s.buts,0)) AS goals,
-                       ROW_NUMBER() OVER (PARTITION BY e.nomequipe ORDER BY SUM(COALESCE(s.buts,0)) DESC) AS rn
-                FROM statistiquejoueur s
-                JOIN joueur j ON s.idjoueur = j.idjoueur
-                JOIN equipe e ON j.id_equipe = e.idequipe
-                WHERE 1=1 {team_where}
-                GROUP BY e.nomequipe, j.nomjoueur
-            ) t
-            WHERE t.rn = 1
-            ORDER BY t.goals DESC
-        """)
-        return pd.read_sql_query(q_rownum, engine, params=params)
-    except Exception:
-        q_fallback = text(f"""
-            SELECT agg.team, agg.player, agg.goals
-            FROM (
-                SELECT e.nomequipe AS team, j.nomjoueur AS player, SUM(COALESCE(s.buts,0)) AS goals
-                FROM statistiquejoueur s
-                JOIN joueur j ON s.idjoueur = j.idjoueur
-                JOIN equipe e ON j.id_equipe = e.idequipe
-                WHERE 1=1 {team_where}
-                GROUP BY e.nomequipe, j.nomjoueur
-            ) agg
-            JOIN (
-                SELECT team AS team2, MAX(goals) AS max_goals
-                FROM (
-                    SELECT e.nomequipe AS team, j.nomjoueur AS player, SUM(COALESCE(s.buts,0)) AS goals
-                    FROM statistiquejoueur s
-                    JOIN joueur j ON s.idjoueur = j.idjoueur
-                    JOIN equipe e ON j.id_equipe = e.idequipe
-                    WHERE 1=1 {team_where}
-                    GROUP BY e.nomequipe, j.nomjoueur
-                ) sub
-                GROUP BY team
-            ) mx ON agg.team = mx.team2 AND agg.goals = mx.max_goals
-            ORDER BY agg.goals DESC
-        """)
-        return pd.read_sql_query(q_fallback, engine, params=params)
-
-@st.cache_data(ttl=300)
-def matches_played_per_team(team_where="", params=None):
-    params = params or {}
-    q = text(f"""
-        SELECT e.nomequipe AS team, COUNT(DISTINCT r.idmatch) AS matches_played
-        FROM resultatmatch r
-        JOIN equipe e ON r.idequipe = e.idequipe
-        WHERE 1=1 {team_where}
-        GROUP BY e.nomequipe
-        ORDER BY matches_played DESC
-    """)
-    return pd.read_sql_query(q, engine, params=params)
+    away_col = 'idteam_away'
+    if match_table:
+        cols = [c['name'] for c in inspector.get_columns(match_table)]
+        if 'idteam__away' in cols:
+            away_col = 'idteam__away'
+    return len(tables), match_table, away_col, 'league_table_mv' in tables
+
+N_TABLES, TABLE_MATCH_NAME, COL_IDTEAM_AWAY, HAS_LEAGUE_MV = _db_shape()
+
+st.sidebar.markdown(f"**Detected DB:** tables={N_TABLES}, match_table={TABLE_MATCH_NAME}, away_col={COL_IDTEAM_AWAY}")
 
 # ---------- UI: Tabs & charts ----------
 tab = st.tabs(["Overview","Top Scorers","Decisive Players","Discipline","Nationalities","Team Goals","Avg Goals/Match","League Table","Defense","Top Scorer per Team","Matches Count"])
 
-team_clause, team_params = team_filter_clause('e')
-nat_clause, nat_params = nationality_filter_clause('j')
-combined_params = {**team_params, **nat_params}
+teams_key = tuple(selected_teams)
+nats_key = tuple(selected_nationalities)
+
+# Start every tab's query up front so their DB round trips overlap;
+# each tab then only waits on its own result.
+executor = ThreadPoolExecutor(max_workers=8)
+futures = {
+    "top": executor.submit(top_scorers, top_n, teams_key, nats_key),
+    "decisive": executor.submit(most_decisive, top_n, teams_key, nats_key),
+    "discipline": executor.submit(most_disciplined, top_n, teams_key, nats_key),
+    "nationality": executor.submit(nationality_distribution, teams_key, nats_key),
+    "goals": executor.submit(total_goals_per_team, teams_key),
+    "avg": executor.submit(avg_goals_per_match, teams_key),
+    "table": executor.submit(league_table, teams_key),
+    "defense": executor.submit(best_defense, teams_key),
+    "top_team": executor.submit(top_scorer_per_team, teams_key, nats_key),
+    "matches": executor.submit(matches_played_per_team, teams_key),
+}
+executor.shutdown(wait=False)
+
+# Tab bodies with widgets (download buttons, the nationality selectbox) are
+# fragments: interacting with them reruns only that fragment, not all 11 tabs.
+@fragment
+def render_frame(df, file_name, spec=None):
+    if spec is not None:
+        display_vega_chart(df, spec)
+    display_dataframe(df)
+    st.download_button("Download CSV", data=df_to_csv_bytes(df), file_name=file_name, mime="text/csv")
+
+@fragment
+def render_nationalities(df_nat):
+    st.write("Select a team to see its nationality breakdown (or leave none to see all).")
+    team_for_nat = st.selectbox("Team for nationality chart (optional)", ["(All)"] + team_options)
+    if team_for_nat != "(All)":
+        df_nat = df_nat[df_nat['team'] == team_for_nat]
+    if not df_nat.empty:
+        spec = {
+            "mark": "bar",
+            "encoding": {
+                "x": {"field": "count", "type": "quantitative"},
+                "y": {"field": "nationality", "type": "nominal", "sort": "-x"},
+                "color": {"field": "team", "type": "nominal"},
+                "tooltip": [{"field": "team"}, {"field": "nationality"}, {"field": "count"}],
+            },
+            "height": 400,
+        }
+        display_vega_chart(df_nat, spec)
+        display_dataframe(df_nat)
+        st.download_button("Download CSV", data=df_to_csv_bytes(df_nat), file_name="nationalities.csv", mime="text/csv")
+    else:
+        st.info("No data after applying selection.")
 
 with tab[0]:
     st.header("Overview")
     st.write("Quick summary statistics")
-    tg = total_goals_per_team(team_clause, combined_params)
-    lt = league_table(team_clause, combined_params)
+    tg = futures["goals"].result()
+    lt = futures["table"].result()
     col1, col2, col3 = st.columns(3)
     col1.metric("Teams in DB", len(team_options))
     col2.metric("Matches (teams with goals rows)", int(tg.shape[0] if not tg.empty else 0))
-    col3.metric("Players (distinct, DB)", load_players_count())
+    col3.metric("Players (distinct, DB)", players_count)
     st.markdown("Use the sidebar to filter by team or nationality. Charts and tables update accordingly.")
 
 with tab[1]:
     st.header(f"Top {top_n} Scorers")
-    df_top = top_scorers(limit=top_n, team_where=team_clause, params=combined_params)
+    df_top = futures["top"].result()
     if df_top.empty:
         st.info("No scorer data available for the selected filters.")
     else:
-        chart = alt.Chart(df_top).mark_bar().encode(
-            x=alt.X("goals:Q"),
-            y=alt.Y("player:N", sort='-x'),
-            tooltip=["player","team","goals"]
-        ).properties(height=400)
-        display_chart(chart, height=400)
-        display_dataframe(df_top)
-        st.download_button("Download CSV", data=df_to_csv_bytes(df_top), file_name="top_scorers.csv", mime="text/csv")
+        spec = {
+            "mark": "bar",
+            "encoding": {
+                "x": {"field": "goals", "type": "quantitative"},
+                "y": {"field": "player", "type": "nominal", "sort": "-x"},
+                "tooltip": [{"field": "player"}, {"field": "team"}, {"field": "goals"}],
+            },
+            "height": 400,
+        }
+        render_frame(df_top, "top_scorers.csv", spec)
 
 with tab[2]:
     st.header("Most Decisive Players (Goals + Assists)")
-    df_dec = most_decisive(limit=top_n, team_where=team_clause, params=combined_params)
-    display_dataframe(df_dec)
-    st.download_button("Download CSV", data=df_to_csv_bytes(df_dec), file_name="decisive_players.csv", mime="text/csv")
+    df_dec = futures["decisive"].result()
+    render_frame(df_dec, "decisive_players.csv")
 
 with tab[3]:
     st.header("Most Disciplined (Yellow / Red Cards)")
-    df_disc = most_disciplined(limit=top_n, team_where=team_clause, params=combined_params)
-    display_dataframe(df_disc)
-    st.download_button("Download CSV", data=df_to_csv_bytes(df_disc), file_name="discipline.csv", mime="text/csv")
+    df_disc = futures["discipline"].result()
+    render_frame(df_disc, "discipline.csv")
 
 with tab[4]:
     st.header("Nationality Distribution by Team")
-    df_nat = nationality_distribution(team_clause, combined_params)
+    df_nat = futures["nationality"].result()
     if df_nat.empty:
         st.info("No nationality data found.")
     else:
-        st.write("Select a team to see its nationality breakdown (or leave none to see all).")
-        team_for_nat = st.selectbox("Team for nationality chart (optional)", ["(All)"] + team_options)
-        if team_for_nat != "(All)":
-            df_nat = df_nat[df_nat['team'] == team_for_nat]
-        if not df_nat.empty:
-            chart = alt.Chart(df_nat).mark_bar().encode(
-                x=alt.X("count:Q"),
-                y=alt.Y("nationality:N", sort='-x'),
-                color=alt.Color("team:N"),
-                tooltip=["team","nationality","count"]
-            ).properties(height=400)
-            display_chart(chart, height=400)
-            display_dataframe(df_nat)
-            st.download_button("Download CSV", data=df_to_csv_bytes(df_nat), file_name="nationalities.csv", mime="text/csv")
-        else:
-            st.info("No data after applying selection.")
+        render_nationalities(df_nat)
 
 with tab[5]:
     st.header("Total Goals by Team")
-    df_goals = total_goals_per_team(team_clause, combined_params)
-    chart = alt.Chart(df_goals).mark_bar().encode(
-        x=alt.X("total_goals_for:Q"),
-        y=alt.Y("team:N", sort='-x'),
-        tooltip=["team","total_goals_for","total_goals_against"]
-    ).properties(height=500)
-    display_chart(chart, height=500)
-    display_dataframe(df_goals)
-    st.download_button("Download CSV", data=df_to_csv_bytes(df_goals), file_name="goals_per_team.csv", mime="text/csv")
+    df_goals = futures["goals"].result()
+    spec = {
+        "mark": "bar",
+        "encoding": {
+            "x": {"field": "total_goals_for", "type": "quantitative"},
+            "y": {"field": "team", "type": "nominal", "sort": "-x"},
+            "tooltip": [{"field": "team"}, {"field": "total_goals_for"}, {"field": "total_goals_against"}],
+        },
+        "height": 500,
+    }
+    render_frame(df_goals, "goals_per_team.csv", spec)
 
 with tab[6]:
     st.header("Average Goals Scored & Conceded per Match (team)")
-    df_avg = avg_goals_per_match(team_clause, combined_params)
-    display_dataframe(df_avg)
-    st.download_button("Download CSV", data=df_to_csv_bytes(df_avg), file_name="avg_goals_per_match.csv", mime="text/csv")
+    df_avg = futures["avg"].result()
+    render_frame(df_avg, "avg_goals_per_match.csv")
 
 with tab[7]:
     st.header("League Table")
-    df_table = league_table(team_clause, combined_params)
-    display_dataframe(df_table)
-    st.download_button("Download CSV", data=df_to_csv_bytes(df_table), file_name="league_table.csv", mime="text/csv")
+    df_table = futures["table"].result()
+    render_frame(df_table, "league_table.csv")
 
 with tab[8]:
     st.header("Teams with Best Defense (Fewest Goals Conceded)")
-    df_def = best_defense(team_clause, combined_params)
-    chart = alt.Chart(df_def).mark_bar().encode(
-        x="goals_conceded:Q",
-        y=alt.Y("team:N", sort='-x'),
-        tooltip=["team","goals_conceded"]
-    ).properties(height=450)
-    display_chart(chart, height=450)
-    display_dataframe(df_def)
-    st.download_button("Download CSV", data=df_to_csv_bytes(df_def), file_name="best_defense.csv", mime="text/csv")
+    df_def = futures["defense"].result()
+    spec = {
+        "mark": "bar",
+        "encoding": {
+            "x": {"field": "goals_conceded", "type": "quantitative"},
+            "y": {"field": "team", "type": "nominal", "sort": "-x"},
+            "tooltip": [{"field": "team"}, {"field": "goals_conceded"}],
+        },
+        "height": 450,
+    }
+    render_frame(df_def, "best_defense.csv", spec)
 
 with tab[9]:
     st.header("Top Scorer per Team")
     try:
-        df_top_team = top_scorer_per_team(team_clause, combined_params)
-        display_dataframe(df_top_team)
-        st.download_button("Download CSV", data=df_to_csv_bytes(df_top_team), file_name="top_scorer_per_team.csv", mime="text/csv")
+        df_top_team = futures["top_team"].result()
+        render_frame(df_top_team, "top_scorer_per_team.csv")
     except Exception as e:
         st.error("Top-scorer-per-team query failed. Error: " + str(e))
 
 with tab[10]:
     st.header("Total Matches Played per Team")
-    df_mp = matches_played_per_team(team_clause, combined_params)
-    display_dataframe(df_mp)
-    st.download_button("Download CSV", data=df_to_csv_bytes(df_mp), file_name="matches_per_team.csv", mime="text/csv")
+    df_mp = futures["matches"].result()
+    render_frame(df_mp, "matches_per_team.csv")
 
 st.markdown("---")
-st.markdown("**Notes:**\n- This dashboard queries the MySQL DB directly. Make sure your database is running and reachable from this machine.\n- Some queries assume aggregated season totals are stored in `statistiquejoueur`. The queries sum over available rows.\n- If MySQL version < 8 (no window functions), the \"Top scorer per team\" query will fall back to a compatible method.")
+st.markdown("**Notes:**\n- This dashboard queries the MySQL DB directly. Make sure your database is running and reachable from this machine.\n- Some queries assume aggregated season totals are stored in `statistiquejoueur`. The queries sum over available rows.\n- Per-tab tables are derived in pandas from two cached aggregates (players, teams), so MySQL 5.x is supported without window functions.")
@@ -1,15 +1,20 @@
 #!/usr/bin/env python3
 """
-Clean & tier fbref data – BRONZE (raw) | SILVER (cleaned) | GOLD (aggregated)
+Clean & tier fbref data – BRONZE (raw CSV) | SILVER (cleaned) | GOLD (aggregated)
+SILVER and GOLD are written as zstd-compressed Parquet.
 
 Run inside the folder that contains the team folders (e.g. fbref_output_1).
 """
 
+import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pacsv
 from tqdm import tqdm
 
 
@@ -29,11 +34,35 @@ GOLD_DIR.mkdir(exist_ok=True)
 # --------------------------------------------------------------------------- #
 # 2. CLEANING HELPERS
 # --------------------------------------------------------------------------- #
+def _bronze_snapshot(src: Path, dest: Path) -> None:
+    """
+    Hard-link the raw CSV into BRONZE (metadata only, no byte copy).
+    Falls back to a copy across filesystems / where links are unsupported.
+    The link shares its inode with the scraper output: a re-scrape (index.py
+    rewrites its CSVs in place) or any edit to either file changes both, so
+    BRONZE only stays a raw snapshot while nothing writes to the team folders
+    other than by replacing files (write to a temp file, then rename).
+    """
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except (OSError, NotImplementedError):
+        shutil.copy(src, dest)
+
+
 def _norm_cols(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = [c.strip().lower().replace(" ", "_").replace("+", "_plus_") for c in df.columns]
     return df
 
 
+def _to_numeric(df: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
+    """Coerce the present `cols` to numbers (bad values → 0) in one block assignment."""
+    present = [c for c in cols if c in df.columns]
+    if present:
+        df[present] = df[present].apply(pd.to_numeric, errors="coerce").fillna(0)
+    return df
+
+
 def clean_scores_fixtures(df: pd.DataFrame) -> pd.DataFrame:
     df = _norm_cols(df)
 
@@ -52,9 +81,7 @@ def clean_scores_fixtures(df: pd.DataFrame) -> pd.DataFrame:
         df["time"] = pd.to_datetime(df["time"], format="%H:%M", errors="coerce").dt.time
 
     numeric = ["gf", "ga", "xg", "xga", "poss", "attendance"]
-    for c in numeric:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
+    df = _to_numeric(df, numeric)
 
     if {"date", "team", "opponent"}.issubset(df.columns):
         before = len(df)
@@ -84,9 +111,7 @@ def clean_standard_stats(df: pd.DataFrame) -> pd.DataFrame:
         "g_minus_pk", "pk", "pkatt", "crdy", "crdr", "xg", "npxg", "xag",
         "npxg_plus_xag", "prgc", "prgp", "prgr",
     ]
-    for c in numeric:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
+    df = _to_numeric(df, numeric)
 
     for c in ["player", "nation", "pos", "team"]:
         if c in df.columns:
@@ -101,99 +126,142 @@ def clean_standard_stats(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def _concat_tables(tables: List[pa.Table]) -> pd.DataFrame:
+    """
+    Concatenate the per-team tables into one frame.
+    Teams don't share dtypes (a column can be int64, double or string depending
+    on the file), so mismatched columns are cast first: numeric ones widen to
+    double like pd.concat would, anything else becomes string.
+    """
+    types = {}
+    for table in tables:
+        for field in table.schema:
+            types.setdefault(field.name, set()).add(field.type)
+    target = {}
+    for name, kinds in types.items():
+        kinds.discard(pa.null())  # all-null columns are promoted by concat_tables itself
+        if len(kinds) > 1:
+            numeric = all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in kinds)
+            target[name] = pa.float64() if numeric else pa.string()
+
+    unified = []
+    for table in tables:
+        for i, field in enumerate(table.schema):
+            if field.name in target and field.type != target[field.name] and field.type != pa.null():
+                table = table.set_column(i, field.name, table.column(i).cast(target[field.name]))
+        unified.append(table)
+    return pa.concat_tables(unified, promote_options="default").to_pandas()
+
+
 # --------------------------------------------------------------------------- #
 # 3. MAIN
 # --------------------------------------------------------------------------- #
+def process_team(team_dir: Path) -> Tuple[List[pa.Table], List[pa.Table]]:
+    """BRONZE/SILVER one team folder; return its (scores, stats) tables for GOLD."""
+    scores_frames: List[pa.Table] = []
+    stats_frames:  List[pa.Table] = []
+
+    team_name = team_dir.name
+
+    bronze_team = BRONZE_DIR / team_name
+    silver_team = SILVER_DIR / team_name
+    bronze_team.mkdir(exist_ok=True)
+    silver_team.mkdir(exist_ok=True)
+
+    for csv_path in team_dir.glob("*.csv"):
+        print(f"Processing: {csv_path.relative_to(BASE_DIR)}")
+
+        # ---- BRONZE ---------------------------------------------------- #
+        bronze_dest = bronze_team / csv_path.name
+        _bronze_snapshot(csv_path, bronze_dest)
+
+        # ---- SILVER ---------------------------------------------------- #
+        # multi-threaded C++ parser; numpy-backed frame so the cleaners'
+        # to_numeric/fillna(0) semantics stay the same
+        raw = pacsv.read_csv(csv_path, read_options=pacsv.ReadOptions(use_threads=True)).to_pandas()
+
+        if "scores_fixtures" in csv_path.name.lower():
+            clean = clean_scores_fixtures(raw)
+        elif "standard_stats" in csv_path.name.lower():
+            clean = clean_standard_stats(raw)
+        else:
+            clean = raw.drop_duplicates()
+            num = clean.select_dtypes(include="number").columns
+            clean[num] = clean[num].fillna(0)
+
+        silver_dest = (silver_team / csv_path.name).with_suffix(".parquet")
+        clean.to_parquet(silver_dest, engine="pyarrow", compression="zstd", index=False)
+
+        # ---- GOLD ------------------------------------------------------ #
+        if team_dir.name.lower() == "all_teams":
+            continue
+
+        # Ensure a team column
+        if "team" not in clean.columns:
+            clean = clean.copy()
+            clean["team"] = team_name
+
+        if "scores_fixtures" in csv_path.name.lower():
+            scores_frames.append(pa.Table.from_pandas(clean, preserve_index=False))
+            continue
+
+        if "standard_stats" in csv_path.name.lower():
+            # ---- SAFELY add to stats aggregation ----------------------- #
+            if "player" not in clean.columns:
+                # try common alternatives
+                for alt in ("name", "Player", "player_name"):
+                    if alt in clean.columns:
+                        clean = clean.rename(columns={alt: "player"})
+                        break
+                else:
+                    print(f"    [WARN] No player column → skipping {csv_path.name} for GOLD stats")
+                    continue
+
+            # final guard
+            if {"player", "team"}.issubset(clean.columns):
+                stats_frames.append(pa.Table.from_pandas(clean, preserve_index=False))
+            else:
+                print(f"    [WARN] Missing player/team → skipping {csv_path.name} for GOLD stats")
+            continue
+
+    return scores_frames, stats_frames
+
+
 def main() -> None:
     team_dirs: List[Path] = [
         p for p in BASE_DIR.iterdir()
         if p.is_dir() and p.name not in {"BRONZE", "SILVER", "GOLD"}
     ]
 
-    scores_frames: List[pd.DataFrame] = []
-    stats_frames:  List[pd.DataFrame] = []
-
-    for team_dir in tqdm(team_dirs, desc="Team folders"):
-        team_name = team_dir.name
-
-        bronze_team = BRONZE_DIR / team_name
-        silver_team = SILVER_DIR / team_name
-        bronze_team.mkdir(exist_ok=True)
-        silver_team.mkdir(exist_ok=True)
+    # Team folders are independent until GOLD: process them in parallel.
+    # Each worker only writes into its own BRONZE/SILVER sub-folder.
+    with ProcessPoolExecutor() as ex:
+        results = list(tqdm(ex.map(process_team, team_dirs), total=len(team_dirs), desc="Team folders"))
 
-        for csv_path in team_dir.glob("*.csv"):
-            print(f"Processing: {csv_path.relative_to(BASE_DIR)}")
-
-            # ---- BRONZE ---------------------------------------------------- #
-            bronze_dest = bronze_team / csv_path.name
-            shutil.copy(csv_path, bronze_dest)
-
-            # ---- SILVER ---------------------------------------------------- #
-            raw = pd.read_csv(csv_path, low_memory=False)
-
-            if "scores_fixtures" in csv_path.name.lower():
-                clean = clean_scores_fixtures(raw)
-            elif "standard_stats" in csv_path.name.lower():
-                clean = clean_standard_stats(raw)
-            else:
-                clean = raw.drop_duplicates()
-                num = clean.select_dtypes(include="number").columns
-                clean[num] = clean[num].fillna(0)
-
-            silver_dest = silver_team / csv_path.name
-            clean.to_csv(silver_dest, index=False)
-
-            # ---- GOLD ------------------------------------------------------ #
-            if team_dir.name.lower() == "all_teams":
-                continue
-
-            # Ensure a team column
-            if "team" not in clean.columns:
-                clean = clean.copy()
-                clean["team"] = team_name
-
-            if "scores_fixtures" in csv_path.name.lower():
-                scores_frames.append(clean)
-                continue
-
-            if "standard_stats" in csv_path.name.lower():
-                # ---- SAFELY add to stats aggregation ----------------------- #
-                if "player" not in clean.columns:
-                    # try common alternatives
-                    for alt in ("name", "Player", "player_name"):
-                        if alt in clean.columns:
-                            clean = clean.rename(columns={alt: "player"})
-                            break
-                    else:
-                        print(f"    [WARN] No player column → skipping {csv_path.name} for GOLD stats")
-                        continue
-
-                # final guard
-                if {"player", "team"}.issubset(clean.columns):
-                    stats_frames.append(clean)
-                else:
-                    print(f"    [WARN] Missing player/team → skipping {csv_path.name} for GOLD stats")
-                continue
+    scores_frames: List[pa.Table] = [f for scores, _ in results for f in scores]
+    stats_frames:  List[pa.Table] = [f for _, stats in results for f in stats]
 
     # --------------------------------------------------------------------- #
     # 4. GOLD – aggregated files
+    # Arrow concat only links the per-team chunks; the single copy happens in
+    # to_pandas() instead of an extra pd.concat buffer.
     # --------------------------------------------------------------------- #
     if scores_frames:
-        all_scores = pd.concat(scores_frames, ignore_index=True)
+        all_scores = _concat_tables(scores_frames)
         all_scores = all_scores.drop_duplicates(subset=["date", "team", "opponent"], keep="first")
         num = all_scores.select_dtypes(include="number").columns
         all_scores[num] = all_scores[num].fillna(0)
-        path = GOLD_DIR / "all_scores_fixtures.csv"
-        all_scores.to_csv(path, index=False)
+        path = GOLD_DIR / "all_scores_fixtures.parquet"
+        all_scores.to_parquet(path, engine="pyarrow", compression="zstd", index=False)
         print(f"\nGOLD scores → {path}")
 
     if stats_frames:
-        all_stats = pd.concat(stats_frames, ignore_index=True)
+        all_stats = _concat_tables(stats_frames)
         all_stats = all_stats.drop_duplicates(subset=["player", "team"], keep="first")
         num = all_stats.select_dtypes(include="number").columns
         all_stats[num] = all_stats[num].fillna(0)
-        path = GOLD_DIR / "all_standard_stats.csv"
-        all_stats.to_csv(path, index=False)
+        path = GOLD_DIR / "all_standard_stats.parquet"
+        all_stats.to_parquet(path, engine="pyarrow", compression="zstd", index=False)
         print(f"GOLD stats  → {path}")
     else:
         print("\nNo valid player-stats files were found for GOLD aggregation.")
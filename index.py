@@ -4,7 +4,8 @@
 #  • Scrapes Scores & Fixtures (all except Match Report)
 #  • For all 20 Premier League teams
 #  • Saves per team CSV + combined
-#  • Uses local Chrome → cached Chrome → cached Edge
+#  • Fetches team pages concurrently over plain HTTP
+#  • Falls back to local Chrome → cached Chrome → cached Edge
 #  • Offline after first run
 # --------------------------------------------------------------
 
@@ -15,14 +16,25 @@ import random
 import zipfile
 import shutil
 import tempfile
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Tuple, Optional
-from io import StringIO
 
+import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup, Comment
+import pyarrow as pa
+from pyarrow import csv as pacsv
+import lxml.html
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 from selenium import webdriver
-from selenium.common.exceptions import WebDriverException
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 
 # ----------------------------------------------------------------------
 # CONFIG
@@ -32,6 +44,39 @@ OUTPUT_DIR = "fbref_output_1"
 HEADLESS = True
 DELAY_MIN = 1.5
 DELAY_MAX = 3.5
+MAX_WORKERS = 6
+PAGE_TIMEOUT = 10
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0 Safari/537.36"
+)
+# Shared by every browser we may start (Edge adds its own headless flag and UA suffix)
+_BROWSER_ARGS = (
+    "--window-size=1920,1080",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-blink-features=AutomationControlled",
+    "--blink-settings=imagesEnabled=false",
+)
+# Only the HTML tables are scraped: don't fetch images, stylesheets, fonts or plugins
+_BROWSER_PREFS = {
+    f"profile.managed_default_content_settings.{kind}": 2
+    for kind in ("images", "stylesheets", "fonts", "plugins")
+}
+
+COMMENT_RE = re.compile(r"<!--(.*?)-->", re.S)
+WHITESPACE_RE = re.compile(r"[\r\n]+|\s{2,}")
+# Cells pandas treats as numbers with ',' thousands separators
+NUMBER_RE = re.compile(r"^[\-\+]?([0-9]+,|[0-9])*(\.[0-9]*)?([0-9]?(E|e)\-?[0-9]+)?$")
+# pandas' default missing-value markers
+NA_STRINGS = frozenset({"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+                        "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"})
+# Standard Stats groups we don't keep, and the fixtures' Match Report column
+DROP_STANDARD_RE = re.compile(r"^(?:Expected|Progression|Per 90 Minutes)|^Matches$")
+MATCH_REPORT_RE = re.compile(r"match\s*report|mr", re.I)
+# Column keywords that identify the Standard Stats and Scores & Fixtures tables
+STD_KEYS = re.compile(r"nation|pos|age|born|gls|ast")
+FIX_KEYS = re.compile(r"date|opponent|result|gf|ga|venue")
 
 CACHE_DIR = Path(__file__).parent / ".webdriver_cache"
 CACHE_DIR.mkdir(exist_ok=True)
@@ -41,7 +86,6 @@ CACHE_DIR.mkdir(exist_ok=True)
 # Helper – download once
 # ----------------------------------------------------------------------
 def _download_once(url: str, dest_zip: Path) -> Path:
-    import urllib.request
     if dest_zip.exists():
         return dest_zip
     print(f"[i] Downloading {url} → {dest_zip.name}")
@@ -53,21 +97,23 @@ def _download_once(url: str, dest_zip: Path) -> Path:
 # ----------------------------------------------------------------------
 # DRIVER INITIALISATION
 # ----------------------------------------------------------------------
+def _chrome_options() -> webdriver.ChromeOptions:
+    opts = webdriver.ChromeOptions()
+    if HEADLESS:
+        opts.add_argument("--headless=new")
+        opts.add_argument("--disable-gpu")
+    for arg in _BROWSER_ARGS:
+        opts.add_argument(arg)
+    opts.add_argument(f"user-agent={USER_AGENT}")
+    opts.add_experimental_option("prefs", _BROWSER_PREFS)
+    # Return from driver.get() at DOMContentLoaded; the tables are in the HTML already
+    opts.page_load_strategy = "eager"
+    return opts
+
+
 def _try_local_chrome() -> Optional[webdriver.Remote]:
     try:
-        opts = webdriver.ChromeOptions()
-        if HEADLESS:
-            opts.add_argument("--headless=new")
-            opts.add_argument("--disable-gpu")
-        opts.add_argument("--window-size=1920,1080")
-        opts.add_argument("--no-sandbox")
-        opts.add_argument("--disable-dev-shm-usage")
-        opts.add_argument("--disable-blink-features=AutomationControlled")
-        opts.add_argument(
-            "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0 Safari/537.36"
-        )
-        driver = webdriver.Chrome(options=opts)
+        driver = webdriver.Chrome(options=_chrome_options())
         print("[*] LOCAL Chrome started")
         return driver
     except Exception as e:
@@ -94,19 +140,7 @@ def _try_local_chrome() -> Optional[webdriver.Remote]:
 
 def _start_cached_chrome() -> webdriver.Remote:
     chromedriver = _get_chrome_driver_path()
-    opts = webdriver.ChromeOptions()
-    if HEADLESS:
-        opts.add_argument("--headless=new")
-        opts.add_argument("--disable-gpu")
-    opts.add_argument("--window-size=1920,1080")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    opts.add_argument("--disable-blink-features=AutomationControlled")
-    opts.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0 Safari/537.36"
-    )
-    driver = webdriver.Chrome(executable_path=str(chromedriver), options=opts)
+    driver = webdriver.Chrome(executable_path=str(chromedriver), options=_chrome_options())
     print("[*] Virtual Chrome (cached) started")
     return driver
 
@@ -130,17 +164,10 @@ def _get_edge_driver_path() -> Path:
 
 def _start_cached_edge() -> webdriver.Remote:
     edgedriver = _get_edge_driver_path()
-    args = [
-        "--window-size=1920,1080",
-        "--no-sandbox",
-        "--disable-dev-shm-usage",
-        "--disable-blink-features=AutomationControlled",
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0 Safari/537.36 Edg/129.0"
-    ]
+    args = [*_BROWSER_ARGS, f"user-agent={USER_AGENT} Edg/129.0"]
     if HEADLESS:
         args[0:0] = ["--headless", "--disable-gpu"]
-    caps = {"browserName": "MicrosoftEdge", "ms:edgeOptions": {"args": args}}
+    caps = {"browserName": "MicrosoftEdge", "pageLoadStrategy": "eager", "ms:edgeOptions": {"args": args, "prefs": _BROWSER_PREFS}}
     driver = webdriver.Edge(executable_path=str(edgedriver), capabilities=caps)
     print("[*] Edge (cached) started")
     return driver
@@ -160,58 +187,205 @@ def init_driver() -> webdriver.Remote:
 # ----------------------------------------------------------------------
 # SCRAPING LOGIC
 # ----------------------------------------------------------------------
+# One polite schedule shared by all workers: each request to fbref starts
+# DELAY_MIN..DELAY_MAX after the previous one, whichever thread sends it.
+# The workers only overlap the time spent waiting on and parsing responses.
+_next_request = 0.0
+_pace_lock = threading.Lock()
+
+
 def polite_sleep():
-    time.sleep(random.uniform(DELAY_MIN, DELAY_MAX))
+    """Block until this thread's turn to send the next request."""
+    global _next_request
+    with _pace_lock:
+        now = time.monotonic()
+        start = max(now, _next_request)
+        _next_request = start + random.uniform(DELAY_MIN, DELAY_MAX)
+    time.sleep(start - now)
 
 
 def fetch_page_html(driver, url: str) -> str:
     driver.get(url)
-    time.sleep(1.0)
-    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-    time.sleep(0.5)
+    # Tables are server-rendered: return as soon as one is in the DOM (no scrolling needed)
+    try:
+        WebDriverWait(driver, PAGE_TIMEOUT).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "table.stats_table"))
+        )
+    except TimeoutException:
+        print(f"[!] No stats table after {PAGE_TIMEOUT}s on {url}")
     return driver.page_source
 
 
+# One keep-alive pool for all workers, so only the first request pays for the TLS handshake.
+# requests already asks for (and decodes) gzip/deflate, and br when brotli is installed.
+# Transient errors are retried with short backoff; a Retry-After (rate limit) is not
+# waited out in the worker: the request fails and the page goes to the browser fallback.
+_session = requests.Session()
+_session.headers["User-Agent"] = USER_AGENT
+_session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=Retry(
+    total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+    respect_retry_after_header=False,
+)))
+
+
+def fetch_html_fast(url: str) -> Optional[str]:
+    """fbref tables are server-rendered: a plain GET is enough unless we get blocked."""
+    polite_sleep()
+    try:
+        resp = _session.get(url, timeout=20)
+    except requests.RequestException as e:
+        print(f"[!] HTTP fetch failed for {url}: {e}")
+        return None
+    if resp.status_code != 200 or "<table" not in resp.text:
+        print(f"[!] HTTP {resp.status_code} for {url} – using the browser")
+        return None
+    return resp.text
+
+
+# Browser fallback: started on first need, shared by the workers one page at a time
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def fetch_html(url: str) -> str:
+    global _driver
+    html = fetch_html_fast(url)
+    if html is not None:
+        return html
+    with _driver_lock:
+        if _driver is None:
+            _driver = init_driver()
+        polite_sleep()
+        return fetch_page_html(_driver, url)
+
+
+def find_all_tables(html: str) -> list:
+    """Live <table> elements, then those fbref hides inside HTML comments."""
+    # Un-comment the hidden tables by appending them to the page, so one parse sees everything
+    hidden = [c for c in COMMENT_RE.findall(html) if "<table" in c]
+    tree = lxml.html.fromstring(html + "\n".join(hidden))
+    return tree.xpath("//table")
+
+
 def find_team_links_from_competition_html(html: str) -> List[Tuple[str, str]]:
-    soup = BeautifulSoup(html, "lxml")
     teams = []
-    tables = soup.find_all("table")
-    for com in soup.find_all(string=lambda t: isinstance(t, Comment)):
-        if "<table" in com:
-            tables.extend(BeautifulSoup(com, "lxml").find_all("table"))
-    for table in tables:
-        anchors = table.find_all("a", href=True)
-        squad_links = [a for a in anchors if "/en/squads/" in a["href"]]
+    for table in find_all_tables(html):
+        squad_links = table.xpath('.//a[contains(@href, "/en/squads/")]')
         if len(squad_links) >= 10:
             for a in squad_links:
-                name = a.get_text(strip=True)
-                href = "https://fbref.com" + a["href"] if a["href"].startswith("/") else a["href"]
+                name = "".join(s.strip() for s in a.itertext())
+                href = a.get("href")
+                href = "https://fbref.com" + href if href.startswith("/") else href
                 teams.append((name, href))
             break
     seen = set()
     return [(n, u) for n, u in teams if u not in seen and not seen.add(u)]
 
 
+def _row_texts(rows) -> List[List[str]]:
+    """Cell texts per <tr>, with colspan/rowspan cells repeated (as pd.read_html does)."""
+    out = []
+    remainder = []  # (column, text, rows still to fill) carried down by rowspan
+    for tr in rows:
+        texts, next_remainder = [], []
+        for td in tr.xpath("./td|./th"):
+            while remainder and remainder[0][0] <= len(texts):
+                i, text, left = remainder.pop(0)
+                texts.append(text)
+                if left > 1:
+                    next_remainder.append((i, text, left - 1))
+            text = WHITESPACE_RE.sub(" ", td.text_content().strip())
+            rowspan = int(td.get("rowspan") or 1)
+            for _ in range(int(td.get("colspan") or 1)):
+                if rowspan > 1:
+                    next_remainder.append((len(texts), text, rowspan - 1))
+                texts.append(text)
+        for i, text, left in remainder:
+            texts.append(text)
+            if left > 1:
+                next_remainder.append((i, text, left - 1))
+        out.append(texts)
+        remainder = next_remainder
+    while remainder:
+        out.append([text for _, text, _ in remainder])
+        remainder = [(i, text, left - 1) for i, text, left in remainder if left > 1]
+    return out
+
+
+def _header_names(head: List[List[str]]) -> list:
+    """Column labels from header rows; blanks become 'Unnamed: …' and repeats get '.N'."""
+    if len(head) == 1:
+        names = [t or f"Unnamed: {i}" for i, t in enumerate(head[0])]
+    else:
+        width = max(map(len, head))
+        names = list(zip(*[
+            [t or f"Unnamed: {i}_level_{lvl}" for i, t in enumerate(row + [""] * (width - len(row)))]
+            for lvl, row in enumerate(head)
+        ]))
+    seen = {}
+    for i, name in enumerate(names):
+        n = seen.get(name, 0)
+        seen[name] = n + 1
+        if n:
+            names[i] = name[:-1] + (f"{name[-1]}.{n}",) if isinstance(name, tuple) else f"{name}.{n}"
+    return names
+
+
+def _parse_column(values: List[Optional[str]]) -> np.ndarray:
+    """Numeric array if every non-blank cell is a number, else the (object) strings."""
+    values = np.array([v.replace(",", "") if v and "," in v and NUMBER_RE.match(v.strip()) else v
+                       for v in values], dtype=object)
+    try:
+        return pd.to_numeric(values)
+    except (ValueError, TypeError):
+        return values
+
+
+def _lxml_table_to_df(table) -> pd.DataFrame:
+    """
+    Build a DataFrame straight from a parsed <table>, matching pd.read_html's output.
+    - <thead> rows (or leading all-<th> rows) are the header; several give a MultiIndex
+    - <tfoot> rows follow the body
+    - Blank / "NaN"-like cells are missing; numeric columns are converted (',' as thousands separator)
+    """
+    for el in table.xpath('.//style | .//*[contains(translate(@style, " ", ""), "display:none")]'):
+        el.drop_tree()
+    head_tr = table.xpath(".//thead//tr")
+    body_tr = table.xpath(".//tbody//tr") + table.xpath("./tr")
+    if not head_tr:
+        while body_tr and all(c.tag == "th" for c in body_tr[0].xpath("./td|./th")):
+            head_tr.append(body_tr.pop(0))
+    head = _row_texts(head_tr)
+    rows = _row_texts(body_tr) + _row_texts(table.xpath(".//tfoot//tr"))
+
+    header = [0] if len(head) == 1 else [i for i, row in enumerate(head) if any(row)]
+    if header:
+        rows = head[header[-1] + 1:] + rows
+        columns = _header_names([head[i] for i in header])
+    else:
+        rows = head + rows
+        columns = None
+    width = max(map(len, rows), default=0)
+    if columns is not None:
+        if width > len(columns):
+            raise ValueError(f"{len(columns)} columns in header, {width} in body")
+        width = len(columns)
+    data = pd.DataFrame({
+        i: _parse_column([row[i] if i < len(row) and row[i] not in NA_STRINGS else None for row in rows])
+        for i in range(width)
+    })
+    if columns is not None:
+        data.columns = pd.MultiIndex.from_tuples(columns) if isinstance(columns[0], tuple) else columns
+    return data
+
+
 def extract_tables_from_html(html: str) -> List[pd.DataFrame]:
     dfs = []
-    soup = BeautifulSoup(html, "lxml")
-    for t in soup.find_all("table"):
+    for t in find_all_tables(html):
         try:
-            tables = pd.read_html(StringIO(str(t)))
-            if tables:
-                dfs.append(tables[0])
+            dfs.append(_lxml_table_to_df(t))
         except Exception:
             continue
-    for com in soup.find_all(string=lambda t: isinstance(t, Comment)):
-        if "<table" in com:
-            try:
-                cs = BeautifulSoup(com, "lxml")
-                for t in cs.find_all("table"):
-                    tables = pd.read_html(StringIO(str(t)))
-                    if tables:
-                        dfs.append(tables[0])
-            except Exception:
-                continue
     return dfs
 
 
@@ -224,25 +398,24 @@ def flatten_multiindex_columns(df: pd.DataFrame) -> pd.DataFrame:
 def select_standard_stats_columns(df: pd.DataFrame) -> pd.DataFrame:
     df = flatten_multiindex_columns(df)
     # Keep base + Playing Time + Performance; drop Expected, Progression, Per 90 Minutes, Matches
-    cols_to_keep = [c for c in df.columns if not c.startswith('Expected') and not c.startswith('Progression') and not c.startswith('Per 90 Minutes') and c != 'Matches']
-    return df[cols_to_keep]
+    return df.drop(columns=df.columns[df.columns.astype(str).str.contains(DROP_STANDARD_RE)])
 
 
 def remove_match_report_col(df: pd.DataFrame) -> pd.DataFrame:
     df = flatten_multiindex_columns(df)
-    cols_to_drop = [c for c in df.columns if re.search(r"match\s*report|mr", str(c), re.I)]
-    return df.drop(columns=cols_to_drop, errors="ignore")
+    return df.drop(columns=df.columns[df.columns.astype(str).str.contains(MATCH_REPORT_RE)])
 
 
 def choose_standard_and_fixtures_tables(dfs: List[pd.DataFrame]) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]:
     standard = fixtures = None
     for df in dfs:
         df_flat = flatten_multiindex_columns(df)
-        cols = " ".join(str(c).lower() for c in df_flat.columns)
-        if standard is None and any(k in cols for k in ("nation", "pos", "age", "born", "gls", "ast")):
-            standard = df_flat.copy()
-        if fixtures is None and any(k in cols for k in ("date", "opponent", "result", "gf", "ga", "venue")):
-            fixtures = df_flat.copy()
+        cols = " ".join(map(str, df_flat.columns)).lower()
+        # No copies: the column selection below already returns new frames
+        if standard is None and STD_KEYS.search(cols):
+            standard = df_flat
+        if fixtures is None and FIX_KEYS.search(cols):
+            fixtures = df_flat
         if standard is not None and fixtures is not None:
             break
     if standard is not None:
@@ -252,9 +425,9 @@ def choose_standard_and_fixtures_tables(dfs: List[pd.DataFrame]) -> Tuple[Option
     return standard, fixtures
 
 
-def process_team_page(driver, team_name: str, team_url: str):
+def process_team_page(team_name: str, team_url: str):
     print(f"[+] {team_name} → {team_url}")
-    html = fetch_page_html(driver, team_url)
+    html = fetch_html(team_url)
     tables = extract_tables_from_html(html)
     if not tables:
         print("  ! No tables found")
@@ -277,6 +450,29 @@ def process_team_page(driver, team_name: str, team_url: str):
     return s_df, f_df
 
 
+def scrape_team(team: Tuple[str, str]):
+    # Worker: the fetches inside wait for their turn on the shared polite schedule
+    name, url = team
+    try:
+        return process_team_page(name, url)
+    except Exception as exc:
+        print(f"   ! error for {name}: {exc}")
+        return None, None
+
+
+def write_csv(df: pd.DataFrame, path: str) -> None:
+    # pyarrow's C++ CSV writer; object columns mixing text and numbers are written as text
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        df = df.assign(**{
+            c: df[c].map(lambda v: v if isinstance(v, str) or pd.isna(v) else str(v))
+            for c in df.select_dtypes(object).columns
+        })
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    pacsv.write_csv(table, path)
+
+
 def safe_filename(s: str) -> str:
     return "".join(ch for ch in s if ch.isalnum() or ch in (" ", "-", "_")).strip().replace(" ", "_")
 
@@ -284,23 +480,24 @@ def safe_filename(s: str) -> str:
 # ----------------------------------------------------------------------
 def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-    driver = init_driver()
     try:
-        comp_html = fetch_page_html(driver, BASE_URL)
+        comp_html = fetch_html(BASE_URL)
         teams = find_team_links_from_competition_html(comp_html)
         print(f"[+] Found {len(teams)} teams")
 
         all_standard = []
         all_fixtures = []
 
-        for name, url in teams:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+            pages = list(ex.map(scrape_team, teams))
+
+        for (name, url), (s_df, f_df) in zip(teams, pages):
             try:
-                s_df, f_df = process_team_page(driver, name, url)
                 safe = safe_filename(name)
 
                 if s_df is not None:
                     path = os.path.join(OUTPUT_DIR, f"{safe}_standard_stats.csv")
-                    s_df.to_csv(path, index=False)
+                    write_csv(s_df, path)
                     print(f"   • standard_stats → {path} ({len(s_df)} rows)")
                     all_standard.append(s_df)
                 else:
@@ -308,7 +505,7 @@ def main():
 
                 if f_df is not None:
                     path = os.path.join(OUTPUT_DIR, f"{safe}_scores_fixtures.csv")
-                    f_df.to_csv(path, index=False)
+                    write_csv(f_df, path)
                     print(f"   • scores_fixtures → {path} ({len(f_df)} rows)")
                     all_fixtures.append(f_df)
                 else:
@@ -317,22 +514,20 @@ def main():
             except Exception as exc:
                 print(f"   ! error for {name}: {exc}")
 
-            polite_sleep()
-
         if all_standard:
-            pd.concat(all_standard, ignore_index=True).to_csv(
-                os.path.join(OUTPUT_DIR, "all_teams_standard_stats.csv"), index=False
-            )
+            write_csv(pd.concat(all_standard, ignore_index=True),
+                      os.path.join(OUTPUT_DIR, "all_teams_standard_stats.csv"))
             print("[+] all_teams_standard_stats.csv written")
         if all_fixtures:
-            pd.concat(all_fixtures, ignore_index=True).to_csv(
-                os.path.join(OUTPUT_DIR, "all_teams_scores_fixtures.csv"), index=False
-            )
+            write_csv(pd.concat(all_fixtures, ignore_index=True),
+                      os.path.join(OUTPUT_DIR, "all_teams_scores_fixtures.csv"))
             print("[+] all_teams_scores_fixtures.csv written")
 
     finally:
-        driver.quit()
-        print("[*] Browser closed – done!")
+        if _driver is not None:
+            _driver.quit()
+            print("[*] Browser closed")
+        print("[*] Done!")
 
 
 if __name__ == "__main__":
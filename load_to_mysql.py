@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 
+import os
+import tempfile
 import pandas as pd
+import pyarrow.parquet as pq
 from pathlib import Path
 import sqlalchemy as sa
 from sqlalchemy.orm import sessionmaker
 from tqdm import tqdm
-from datetime import datetime
 
 # DB Config (MySQL)
 DB_USER = "root"
@@ -16,27 +18,127 @@ DB_NAME = "football_db"
 
 # Connect to DB
 url = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
-engine = sa.create_engine(url)
+# local_infile lets LOAD DATA LOCAL stream our temp files (the server needs local_infile=ON too)
+engine = sa.create_engine(url, connect_args={'local_infile': True})
 Session = sessionmaker(bind=engine)
 session = Session()
 
-def safe_int(x):
-    try:
-        return int(pd.to_numeric(x, errors='coerce').fillna(0))
-    except:
-        return 0
+# MySQL 8 ships with local_infile=OFF; without it, load with batched INSERTs instead of LOAD DATA
+LOCAL_INFILE = bool(session.execute(sa.text("SELECT @@local_infile")).scalar())
+if not LOCAL_INFILE:
+    print("[WARN] Server has local_infile=OFF, falling back to batched INSERTs")
 
-def safe_time(x):
-    try:
-        return datetime.strptime(str(x), '%H:%M').time() if x and not pd.isna(x) else None
-    except:
-        return None
+def safe_int(col):
+    # Whole column at once; anything non-numeric becomes 0
+    return pd.to_numeric(col, errors='coerce').fillna(0).astype(int)
+
+def safe_time(col):
+    # 'HH:MM' as scraped, 'HH:MM:SS' once it has been through data.py; anything else is NULL
+    text = col.astype(str)
+    t = pd.to_datetime(text, format='%H:%M', errors='coerce')
+    t = t.fillna(pd.to_datetime(text, format='%H:%M:%S', errors='coerce'))
+    return t.dt.time.astype(object).where(t.notna(), None)
+
+def safe_date(col):
+    d = pd.to_datetime(col, errors='coerce')
+    return d.dt.date.astype(object).where(d.notna(), None)
+
+def match_result(gf, ga):
+    return pd.Series('Nul', index=gf.index).mask(gf > ga, 'Victoire').mask(gf < ga, 'Défaite')
 
-def safe_date(x):
+def column(df, name, default=''):
+    # Column-wise row.get(name, default)
+    return df[name] if name in df.columns else pd.Series(default, index=df.index)
+
+def to_tsv(df):
+    # LOAD DATA's default format: tab-separated, backslash escapes, \N for NULL
+    cols = []
+    for c in df.columns:
+        col = df[c].astype(object)
+        text = (col.astype(str).str.replace('\\', '\\\\', regex=False)
+                .str.replace('\t', '\\t', regex=False).str.replace('\n', '\\n', regex=False))
+        cols.append(text.mask(col.isna(), '\\N'))
+    return ''.join(line + '\n' for line in cols[0].str.cat(cols[1:], sep='\t'))
+
+def insert_many(df, table, ignore=False, update_cols=()):
+    # One executemany INSERT for the whole frame (used when LOAD DATA LOCAL is unavailable)
+    sql = f"""
+        INSERT {'IGNORE' if ignore else ''} INTO {table} ({', '.join(df.columns)})
+        VALUES ({', '.join(f':{c}' for c in df.columns)})
+    """
+    if update_cols:
+        sql += f"ON DUPLICATE KEY UPDATE {', '.join(f'{c} = VALUES({c})' for c in update_cols)}"
+    session.execute(sa.text(sql), df.astype(object).where(df.notna(), None).to_dict('records'))
+
+def load_data(df, table, ignore=False):
+    # Bulk-load df into table (columns by name) in one statement parsed server-side
+    if not LOCAL_INFILE:
+        return insert_many(df, table, ignore)
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False, encoding='utf-8', newline='') as f:
+        f.write(to_tsv(df))
     try:
-        return pd.to_datetime(x, errors='coerce').date()
-    except:
-        return None
+        session.execute(sa.text(f"""
+            LOAD DATA LOCAL INFILE :path {'IGNORE' if ignore else ''} INTO TABLE {table}
+            CHARACTER SET utf8mb4 ({', '.join(df.columns)})
+        """), {'path': Path(f.name).as_posix()})
+    finally:
+        os.unlink(f.name)
+
+def upsert(df, table, update_cols):
+    # LOAD DATA has no ON DUPLICATE KEY UPDATE: load a staging copy, then merge it in one statement
+    if not LOCAL_INFILE:
+        return insert_many(df, table, update_cols=update_cols)
+    stage = f'stage_{table}'
+    session.execute(sa.text(f"CREATE TEMPORARY TABLE IF NOT EXISTS {stage} LIKE {table}"))
+    session.execute(sa.text(f"DELETE FROM {stage}"))
+    load_data(df, stage)
+    cols = ', '.join(df.columns)
+    session.execute(sa.text(f"""
+        INSERT INTO {table} ({cols})
+        SELECT {cols} FROM {stage} AS s
+        ON DUPLICATE KEY UPDATE {', '.join(f'{c} = s.{c}' for c in update_cols)}
+    """))
+
+def silver_files(kind):
+    # data.py writes SILVER as Parquet; older snapshots are CSV. One file per stem, Parquet wins.
+    files = {p.with_suffix(''): p for p in SILVER_DIR.rglob(f'*_{kind}.csv')}
+    files.update({p.with_suffix(''): p for p in SILVER_DIR.rglob(f'*_{kind}.parquet')})
+    return sorted(files.values())
+
+def normalize(name):
+    return name.strip().lower().replace(' ', '_')
+
+# The only SILVER columns the loops read (after normalize); the rest are never parsed
+STATS_COLUMNS = {
+    'unnamed:_0_level_0_player', 'unnamed:_1_level_0_nation', 'unnamed:_2_level_0_pos',
+    'performance_gls', 'performance_ast', 'playing_time_mp', 'performance_crdy', 'performance_crdr',
+}
+FIXTURE_COLUMNS = {'date', 'time', 'round', 'venue', 'opponent', 'gf', 'ga'}
+
+def read_silver(file_path, columns):
+    if file_path.suffix == '.parquet':
+        names = pq.read_schema(file_path).names
+        return pd.read_parquet(file_path, columns=[c for c in names if normalize(c) in columns])
+    return pd.read_csv(file_path, usecols=lambda c: normalize(c) in columns)
+
+def read_fixtures(file_path):
+    # Played fixtures with the columns the match/result rows are built from
+    df = read_silver(file_path, FIXTURE_COLUMNS)
+    df.columns = [normalize(c) for c in df.columns]
+    # Parse dates/times before fillna: a filled 0 reads as 1970-01-01 (the repeated header row's blank date)
+    date_match = safe_date(column(df, 'date', None))
+    heure = safe_time(column(df, 'time', None))
+    df = df.fillna(0)
+    df = df.assign(
+        date_match=date_match,
+        heure=heure,
+        round=column(df, 'round').astype(str).str.strip(),
+        venue=column(df, 'venue').astype(str).str.strip(),
+        opponent=column(df, 'opponent').astype(str).str.strip(),
+        butsmarques=safe_int(column(df, 'gf', 0)),
+        butsconcedes=safe_int(column(df, 'ga', 0)),
+    )
+    return df[df['date_match'].notna() & df['opponent'].ne('')]
 
 # Insert competition and saison if not exist
 session.execute(sa.text("""
@@ -50,147 +152,168 @@ session.execute(sa.text("""
 comp_id = session.execute(sa.text("SELECT idcompetition FROM competition WHERE nomcompetition = 'Premier League'")).scalar()
 saison_id = session.execute(sa.text("SELECT id_saison FROM saison WHERE annee = '2024-2025'")).scalar()
 
-# Process stats files
 SILVER_DIR = Path('SILVER')
-for file_path in tqdm(list(SILVER_DIR.rglob('*_standard_stats.csv'))):
+stats_files = silver_files('standard_stats')
+fixtures = {}
+for file_path in silver_files('scores_fixtures'):
     try:
-        df = pd.read_csv(file_path, low_memory=False)
+        fixtures[file_path] = read_fixtures(file_path)
+    except Exception as e:
+        print(f"[ERROR] Failed on {file_path}: {e}")
+
+# Insert every team up front (one per SILVER folder, plus all opponents), then map names to ids once
+team_names = [fp.parent.name.replace('_', ' ') for fp in [*stats_files, *fixtures]]
+team_names += [name for df in fixtures.values() for name in df['opponent'].unique()]
+if team_names:
+    session.execute(sa.text("""
+        INSERT IGNORE INTO equipe (nomequipe, idcompetition, idsaison)
+        VALUES (:nomequipe, :idcompetition, :idsaison)
+    """), [{'nomequipe': name, 'idcompetition': comp_id, 'idsaison': saison_id} for name in dict.fromkeys(team_names)])
+
+TEAM_ID = dict(session.execute(sa.text("""
+    SELECT nomequipe, idequipe FROM equipe WHERE idcompetition = :idcompetition AND idsaison = :idsaison
+"""), {'idcompetition': comp_id, 'idsaison': saison_id}).all())
+session.commit()
+
+# Both loops run as one transaction so InnoDB flushes a single commit instead of one per file;
+# each file gets a savepoint so a bad file is still rolled back on its own. foreign_key_checks
+# is session-scoped, so it dies with the connection even if the script does. unique_checks stays
+# on: INSERT IGNORE / ON DUPLICATE KEY rely on the unique keys to dedupe.
+session.execute(sa.text("SET foreign_key_checks = 0"))
+
+# Process stats files
+for file_path in tqdm(stats_files):
+    savepoint = session.begin_nested()
+    try:
+        df = read_silver(file_path, STATS_COLUMNS)
         df = df.fillna(0)
-        df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
+        df.columns = [normalize(c) for c in df.columns]
+        
+        equipe_id = TEAM_ID[file_path.parent.name.replace('_', ' ')]
+        
+        players = pd.DataFrame({
+            'nomjoueur': column(df, 'unnamed:_0_level_0_player').astype(str).str.strip(),
+            'position': column(df, 'unnamed:_2_level_0_pos').astype(str).str.strip(),
+            'nationalite': column(df, 'unnamed:_1_level_0_nation').astype(str).str.strip(),
+        })
+        keep = players['nomjoueur'].ne('') & ~players['nomjoueur'].str.contains('Squad|Opponent')
+        players, df = players[keep], df[keep]
+        if players.empty:
+            savepoint.commit()
+            continue
         
-        team_name = file_path.parent.name.replace('_', ' ')
+        # Insert players, then map names to ids with one SELECT
+        load_data(players.assign(id_equipe=equipe_id), 'joueur', ignore=True)
         
-        # Insert team
-        session.execute(sa.text("""
-            INSERT IGNORE INTO equipe (nomequipe, idcompetition, idsaison)
-            VALUES (:nomequipe, :idcompetition, :idsaison)
-        """), {'nomequipe': team_name, 'idcompetition': comp_id, 'idsaison': saison_id})
+        player_ids = dict(session.execute(sa.text("""
+            SELECT nomjoueur, idjoueur FROM joueur WHERE id_equipe = :id_equipe
+        """), {'id_equipe': equipe_id}).all())
         
-        equipe_id = session.execute(sa.text("""
-            SELECT idequipe FROM equipe WHERE nomequipe = :nomequipe AND idcompetition = :idcompetition AND idsaison = :idsaison
-        """), {'nomequipe': team_name, 'idcompetition': comp_id, 'idsaison': saison_id}).scalar()
+        stats = pd.DataFrame({
+            'idjoueur': players['nomjoueur'].map(player_ids),
+            'buts': safe_int(column(df, 'performance_gls', 0)),
+            'passesdecisives': safe_int(column(df, 'performance_ast', 0)),
+            'nbmatchesplayed': safe_int(column(df, 'playing_time_mp', 0)),
+            'cartonsjaunes': safe_int(column(df, 'performance_crdy', 0)),
+            'cartonsrouges': safe_int(column(df, 'performance_crdr', 0)),
+        }).dropna(subset=['idjoueur']).astype({'idjoueur': int})
         
-        for _, row in df.iterrows():
-            nomjoueur = str(row.get('unnamed:_0_level_0_player', '')).strip()
-            if not nomjoueur or 'Squad' in nomjoueur or 'Opponent' in nomjoueur:
-                continue
-            
-            position = str(row.get('unnamed:_2_level_0_pos', '')).strip()
-            nationalite = str(row.get('unnamed:_1_level_0_nation', '')).strip()
-            
-            # Insert player
-            session.execute(sa.text("""
-                INSERT IGNORE INTO joueur (nomjoueur, position, nationalite, id_equipe)
-                VALUES (:nomjoueur, :position, :nationalite, :id_equipe)
-            """), {'nomjoueur': nomjoueur, 'position': position, 'nationalite': nationalite, 'id_equipe': equipe_id})
-            
-            idjoueur = session.execute(sa.text("""
-                SELECT idjoueur FROM joueur WHERE nomjoueur = :nomjoueur AND id_equipe = :id_equipe
-            """), {'nomjoueur': nomjoueur, 'id_equipe': equipe_id}).scalar()
-            
-            if idjoueur:
-                buts = safe_int(row.get('performance_gls', 0))
-                passesdecisives = safe_int(row.get('performance_ast', 0))
-                nbmatchesplayed = safe_int(row.get('playing_time_mp', 0))
-                cartonsjaunes = safe_int(row.get('performance_crdy', 0))
-                cartonsrouges = safe_int(row.get('performance_crdr', 0))
-                
-                # Insert stats
-                session.execute(sa.text("""
-                    INSERT INTO statistiquejoueur (idjoueur, buts, passesdecisives, nbmatchesplayed, cartonsjaunes, cartonsrouges)
-                    VALUES (:idjoueur, :buts, :passesdecisives, :nbmatchesplayed, :cartonsjaunes, :cartonsrouges)
-                    ON DUPLICATE KEY UPDATE buts = :buts, passesdecisives = :passesdecisives, nbmatchesplayed = :nbmatchesplayed, cartonsjaunes = :cartonsjaunes, cartonsrouges = :cartonsrouges
-                """), {'idjoueur': idjoueur, 'buts': buts, 'passesdecisives': passesdecisives, 'nbmatchesplayed': nbmatchesplayed, 'cartonsjaunes': cartonsjaunes, 'cartonsrouges': cartonsrouges})
+        # Insert stats
+        upsert(stats, 'statistiquejoueur', ['buts', 'passesdecisives', 'nbmatchesplayed', 'cartonsjaunes', 'cartonsrouges'])
         
-        session.commit()
+        savepoint.commit()
     except Exception as e:
         print(f"[ERROR] Failed on {file_path}: {e}")
-        session.rollback()
+        savepoint.rollback()
 
 # Process scores files
-for file_path in tqdm(list(SILVER_DIR.rglob('*_scores_fixtures.csv'))):
+for file_path, df in tqdm(fixtures.items()):
+    if df.empty:
+        continue
+    savepoint = session.begin_nested()
     try:
-        df = pd.read_csv(file_path, low_memory=False)
-        df = df.fillna(0)
-        df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
+        equipe_id = TEAM_ID[file_path.parent.name.replace('_', ' ')]
+        opponent_id = df['opponent'].map(TEAM_ID)
         
-        team_name = file_path.parent.name.replace('_', ' ')
+        # Scores are stored from the home side's point of view
+        home = df['venue'] == 'home'
+        matches = pd.DataFrame({
+            'date_match': df['date_match'],
+            'heure': df['heure'],
+            'round': df['round'],
+            'venue': df['venue'],
+            'idteamhome': opponent_id.where(~home, equipe_id),
+            'idteam__away': opponent_id.where(home, equipe_id),
+            'id_competition': comp_id,
+            'id_saison': saison_id,
+        }).astype({'idteamhome': int, 'idteam__away': int})
+        butsmarques = df['butsmarques'].where(home, df['butsconcedes'])
+        butsconcedes = df['butsconcedes'].where(home, df['butsmarques'])
         
-        # Insert team
-        session.execute(sa.text("""
-            INSERT IGNORE INTO equipe (nomequipe, idcompetition, idsaison)
-            VALUES (:nomequipe, :idcompetition, :idsaison)
-        """), {'nomequipe': team_name, 'idcompetition': comp_id, 'idsaison': saison_id})
+        # Insert matches
+        load_data(matches, '`match`', ignore=True)
         
-        equipe_id = session.execute(sa.text("""
-            SELECT idequipe FROM equipe WHERE nomequipe = :nomequipe AND idcompetition = :idcompetition AND idsaison = :idsaison
-        """), {'nomequipe': team_name, 'idcompetition': comp_id, 'idsaison': saison_id}).scalar()
+        keys = ['date_match', 'idteamhome', 'idteam__away']
+        known = pd.DataFrame(session.execute(sa.text("""
+            SELECT idmatch_, date_match, idteamhome, idteam__away FROM `match`
+            WHERE idteamhome = :idequipe OR idteam__away = :idequipe
+        """), {'idequipe': equipe_id}).all(), columns=['idmatch'] + keys)
+        idmatch = matches[keys].merge(known.drop_duplicates(keys, keep='last'), how='left', on=keys)['idmatch']
+        idmatch = idmatch.astype('Int64').set_axis(matches.index)
+        found = idmatch.notna()
         
-        for _, row in df.iterrows():
-            date_match = safe_date(row.get('date', 0))
-            if not date_match:
-                continue
-            
-            heure = safe_time(row.get('time', 0))
-            round_val = str(row.get('round', '')).strip()
-            venue = str(row.get('venue', '')).strip()
-            
-            opponent = str(row.get('opponent', '')).strip()
-            if not opponent:
-                continue
-            
-            # Insert opponent team
-            session.execute(sa.text("""
-                INSERT IGNORE INTO equipe (nomequipe, idcompetition, idsaison)
-                VALUES (:nomequipe, :idcompetition, :idsaison)
-            """), {'nomequipe': opponent, 'idcompetition': comp_id, 'idsaison': saison_id})
-            
-            opponent_id = session.execute(sa.text("""
-                SELECT idequipe FROM equipe WHERE nomequipe = :nomequipe AND idcompetition = :idcompetition AND idsaison = :idsaison
-            """), {'nomequipe': opponent, 'idcompetition': comp_id, 'idsaison': saison_id}).scalar()
-            
-            butsmarques = safe_int(row.get('gf', 0))
-            butsconcedes = safe_int(row.get('ga', 0))
-            
-            if venue == 'home':
-                idteamhome = equipe_id
-                idteam__away = opponent_id
-            else:
-                idteamhome = opponent_id
-                idteam__away = equipe_id
-                butsmarques, butsconcedes = butsconcedes, butsmarques
-            
-            # Insert match
-            session.execute(sa.text("""
-                INSERT IGNORE INTO `match` (date_match, heure, round, venue, idteamhome, idteam__away, id_competition, id_saison)
-                VALUES (:date_match, :heure, :round, :venue, :idteamhome, :idteam__away, :id_competition, :id_saison)
-            """), {'date_match': date_match, 'heure': heure, 'round': round_val, 'venue': venue, 'idteamhome': idteamhome, 'idteam__away': idteam__away, 'id_competition': comp_id, 'id_saison': saison_id})
-            
-            idmatch = session.execute(sa.text("""
-                SELECT idmatch_ FROM `match` WHERE date_match = :date_match AND idteamhome = :idteamhome AND idteam__away = :idteam__away
-            """), {'date_match': date_match, 'idteamhome': idteamhome, 'idteam__away': idteam__away}).scalar()
-            
-            if idmatch:
-                resultat = 'Victoire' if butsmarques > butsconcedes else 'Défaite' if butsmarques < butsconcedes else 'Nul'
-                
-                # Insert for home team
-                session.execute(sa.text("""
-                    INSERT INTO resultatmatch (idmatch, idequipe, butsmarques, butsconcedes, resultat)
-                    VALUES (:idmatch, :idequipe, :butsmarques, :butsconcedes, :resultat)
-                    ON DUPLICATE KEY UPDATE butsmarques = :butsmarques
-                """), {'idmatch': idmatch, 'idequipe': idteamhome, 'butsmarques': butsmarques, 'butsconcedes': butsconcedes, 'resultat': resultat})
-                
-                # Insert for away team
-                away_resultat = 'Victoire' if butsconcedes > butsmarques else 'Défaite' if butsconcedes < butsmarques else 'Nul'
-                session.execute(sa.text("""
-                    INSERT INTO resultatmatch (idmatch, idequipe, butsmarques, butsconcedes, resultat)
-                    VALUES (:idmatch, :idequipe, :butsmarques, :butsconcedes, :resultat)
-                    ON DUPLICATE KEY UPDATE butsmarques = :butsmarques
-                """), {'idmatch': idmatch, 'idequipe': idteam__away, 'butsmarques': butsconcedes, 'butsconcedes': butsmarques, 'resultat': away_resultat})
+        # One row for the home team and one for the away team
+        results = pd.concat([
+            pd.DataFrame({'idmatch': idmatch, 'idequipe': matches['idteamhome'], 'butsmarques': butsmarques,
+                          'butsconcedes': butsconcedes, 'resultat': match_result(butsmarques, butsconcedes)})[found],
+            pd.DataFrame({'idmatch': idmatch, 'idequipe': matches['idteam__away'], 'butsmarques': butsconcedes,
+                          'butsconcedes': butsmarques, 'resultat': match_result(butsconcedes, butsmarques)})[found],
+        ])
+        if not results.empty:
+            upsert(results, 'resultatmatch', ['butsmarques'])
         
-        session.commit()
+        savepoint.commit()
     except Exception as e:
         print(f"[ERROR] Failed on {file_path}: {e}")
-        session.rollback()
+        savepoint.rollback()
+
+session.commit()
+session.execute(sa.text("SET foreign_key_checks = 1"))
+
+# Covering indexes for the app's aggregation joins, so the SUMs are answered from
+# the index without row lookups. MySQL has no CREATE INDEX IF NOT EXISTS.
+COVERING_INDEXES = {
+    'ix_sj_cover': ('statistiquejoueur', 'idjoueur, buts, passesdecisives, cartonsjaunes, cartonsrouges'),
+    'ix_rm_cover': ('resultatmatch', 'idequipe, butsmarques, butsconcedes, idmatch, resultat'),
+}
+existing = set(session.execute(sa.text("""
+    SELECT DISTINCT index_name FROM information_schema.statistics WHERE table_schema = DATABASE()
+""")).scalars())
+for name, (table, cols) in COVERING_INDEXES.items():
+    if name not in existing:
+        session.execute(sa.text(f"CREATE INDEX {name} ON {table} ({cols})"))
+
+# Materialized per-team aggregates read by the app's league table / team tabs.
+# Rebuilt after every load (the only writer) and swapped in atomically.
+session.execute(sa.text("DROP TABLE IF EXISTS league_table_mv_new"))
+session.execute(sa.text("""
+    CREATE TABLE league_table_mv_new AS
+    SELECT e.nomequipe AS team,
+           SUM(COALESCE(r.butsmarques,0)) AS goals_for,
+           SUM(COALESCE(r.butsconcedes,0)) AS goals_against,
+           COUNT(DISTINCT r.idmatch) AS matches_played,
+           SUM(CASE WHEN r.resultat='Victoire' THEN 1 ELSE 0 END) AS wins,
+           SUM(CASE WHEN r.resultat='Nul' THEN 1 ELSE 0 END) AS draws,
+           SUM(CASE WHEN r.resultat='Défaite' THEN 1 ELSE 0 END) AS losses
+    FROM resultatmatch r
+    JOIN equipe e ON r.idequipe = e.idequipe
+    GROUP BY e.nomequipe
+"""))
+session.execute(sa.text("CREATE TABLE IF NOT EXISTS league_table_mv LIKE league_table_mv_new"))
+session.execute(sa.text("""
+    RENAME TABLE league_table_mv TO league_table_mv_old, league_table_mv_new TO league_table_mv
+"""))
+session.execute(sa.text("DROP TABLE league_table_mv_old"))
+session.commit()
 
 session.close()
\ No newline at end of file